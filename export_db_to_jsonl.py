@@ -6,10 +6,93 @@ Converts SQLite databases to JSONL (one JSON object per line) for efficient proc
 
 import sqlite3
 import json
+import os
+import contextlib
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Any
 
+# Rows fetched per batch while streaming tables to JSONL
+FETCH_BATCH_SIZE = 10000
+
+WORKSPACE_STORAGE_ROOT = Path("/Users/hamidaho/Desktop/new_experiments/comprehensive_real_time_export/User/workspaceStorage")
+
+def _list_state_dbs() -> List[Path]:
+    """Find workspace state databases with a single directory scan"""
+    if not WORKSPACE_STORAGE_ROOT.exists():
+        return []
+    return [Path(entry.path) / "state.vscdb"
+            for entry in os.scandir(WORKSPACE_STORAGE_ROOT)
+            if entry.is_dir() and os.path.exists(os.path.join(entry.path, "state.vscdb"))]
+
+# Output buffering: 4 MiB file buffer, flush accumulated records at 1 MiB
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+WRITE_FLUSH_THRESHOLD = 1024 * 1024
+
+# Optional: zstd-compressed .jsonl.zst output shrinks log-shaped JSON
+# 5-10x before it ships to the Hugging Face repo
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+# Optional: orjson serializes 5-10x faster than stdlib json and emits
+# bytes directly, which dominates the per-row cost on large exports
+try:
+    import orjson
+    def _dumps_line(record: Dict) -> bytes:
+        return orjson.dumps(record, default=str) + b'\n'
+except ImportError:
+    def _dumps_line(record: Dict) -> bytes:
+        return (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+
+def _open_db(db_path) -> sqlite3.Connection:
+    """Open a database read-only with performance PRAGMAs applied
+
+    Read-only mode avoids creating -wal/-shm side files next to the
+    source database; the PRAGMAs trade the tiny default page cache for
+    one sized to repeated full-table scans over multi-GB databases.
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    for pragma in ("synchronous=NORMAL",
+                   "cache_size=-262144",  # 256 MB page cache
+                   "mmap_size=30000000000",
+                   "temp_store=MEMORY"):
+        try:
+            conn.execute(f"PRAGMA {pragma}")
+        except sqlite3.Error:
+            pass
+    return conn
+
+# Column lists memoized on (table, schema SQL) - the workspace state
+# databases all share one schema, so table_info runs once per shape
+# rather than once per database, and a schema change invalidates the key
+_columns_cache: Dict[tuple, List[str]] = {}
+
+def _quote_ident(name: str) -> str:
+    """Quote an SQL identifier (table names come from sqlite_master)"""
+    return '"' + name.replace('"', '""') + '"'
+
+def _table_columns(cursor: sqlite3.Cursor, table: str) -> List[str]:
+    """Get a table's column names, cached across identically-shaped tables"""
+    cursor.execute("SELECT group_concat(sql) FROM sqlite_master WHERE tbl_name = ?", (table,))
+    schema_sig = cursor.fetchone()[0] or ""
+    key = (table, schema_sig)
+    columns = _columns_cache.get(key)
+    if columns is None:
+        cursor.execute(f"PRAGMA table_info({_quote_ident(table)})")
+        columns = [row[1] for row in cursor.fetchall()]
+        _columns_cache[key] = columns
+    return columns
+
+def _close_db(conn: sqlite3.Connection):
+    """Close a connection, letting SQLite refresh planner stats first"""
+    try:
+        conn.execute("PRAGMA optimize")
+    except sqlite3.Error:
+        pass
+    conn.close()
+
 def export_db_to_jsonl():
     """Export all cursor databases to JSONL format"""
     
@@ -22,8 +105,7 @@ def export_db_to_jsonl():
     ]
     
     # Find all state databases
-    state_dbs = list(Path("/Users/hamidaho/Desktop/new_experiments/comprehensive_real_time_export/User/workspaceStorage").glob("*/state.vscdb"))
-    db_paths.extend([str(db) for db in state_dbs])
+    db_paths.extend([str(db) for db in _list_state_dbs()])
     
     print(f"📊 Found {len(db_paths)} databases to export")
     
@@ -35,7 +117,7 @@ def export_db_to_jsonl():
         print(f"🔍 Processing: {Path(db_path).name}")
         
         try:
-            conn = sqlite3.connect(db_path)
+            conn = _open_db(db_path)
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
@@ -47,41 +129,51 @@ def export_db_to_jsonl():
             output_file = Path(db_path).stem + ".jsonl"
             output_path = Path("/Users/hamidaho/Desktop/new_experiments") / output_file
             
-            with open(output_path, 'w', encoding='utf-8') as f:
+            with open(output_path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+                buf = bytearray()
                 for table in tables:
                     print(f"  📤 Exporting table: {table}")
                     
                     # Get table schema
-                    cursor.execute(f"PRAGMA table_info({table})")
-                    columns = [row[1] for row in cursor.fetchall()]
+                    columns = _table_columns(cursor, table)
                     
-                    # Export all rows
-                    cursor.execute(f"SELECT * FROM {table}")
+                    # Export all rows in batches so memory stays O(batch)
+                    cursor.arraysize = FETCH_BATCH_SIZE
+                    cursor.execute(f"SELECT * FROM {_quote_ident(table)}")
                     row_count = 0
-                    
-                    for row in cursor.fetchall():
-                        # Convert row to dictionary
-                        row_dict = dict(zip(columns, row))
-                        
-                        # Add metadata
-                        record = {
-                            "database": str(db_path),
-                            "table": table,
-                            "timestamp": datetime.now().isoformat(),
-                            "data": row_dict
-                        }
-                        
-                        # Write as JSONL
-                        f.write(json.dumps(record, ensure_ascii=False) + '\n')
-                        row_count += 1
-                        
-                        # Progress indicator for large tables
-                        if row_count % 10000 == 0:
-                            print(f"    Exported {row_count:,} records from {table}")
+
+                    while True:
+                        rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+                        if not rows:
+                            break
+                        for row in rows:
+                            # Convert row to dictionary
+                            row_dict = dict(zip(columns, row))
+
+                            # Add metadata
+                            record = {
+                                "database": str(db_path),
+                                "table": table,
+                                "timestamp": datetime.now().isoformat(),
+                                "data": row_dict
+                            }
+
+                            # Write as JSONL (batched into ~1 MiB writes)
+                            buf += _dumps_line(record)
+                            if len(buf) >= WRITE_FLUSH_THRESHOLD:
+                                f.write(buf)
+                                buf.clear()
+                            row_count += 1
+
+                            # Progress indicator for large tables
+                            if row_count % 10000 == 0:
+                                print(f"    Exported {row_count:,} records from {table}")
                     
                     print(f"  ✅ Exported {row_count:,} records from {table}")
-            
-            conn.close()
+                if buf:
+                    f.write(buf)
+
+            _close_db(conn)
             print(f"✅ Completed: {output_path}")
             
         except Exception as e:
@@ -108,49 +200,69 @@ def export_main_activity_db():
     
     print(f"🔍 Exporting main activity database to JSONL...")
     
-    conn = sqlite3.connect(db_path)
+    conn = _open_db(db_path)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
     # Get table counts
     tables = ['api2_cursor_activities', 'other_cursor_activities', 'api3_cursor_activities', 'api_sessions']
-    
-    output_path = Path("/Users/hamidaho/Desktop/new_experiments/cursor_activity.jsonl")
-    
-    with open(output_path, 'w', encoding='utf-8') as f:
+
+    # Compressed output when zstandard is available; HF datasets reads
+    # .jsonl.zst natively and level 3 with worker threads is near-memcpy
+    suffix = ".jsonl.zst" if zstd is not None else ".jsonl"
+    output_path = Path("/Users/hamidaho/Desktop/new_experiments/cursor_activity" + suffix)
+
+    with open(output_path, 'wb', buffering=WRITE_BUFFER_SIZE) as raw, \
+         contextlib.ExitStack() as stack:
+        if zstd is not None:
+            cctx = zstd.ZstdCompressor(level=3, threads=-1)
+            f = stack.enter_context(cctx.stream_writer(raw))
+        else:
+            f = raw
+        buf = bytearray()
         for table in tables:
             print(f"📤 Exporting {table}...")
             
-            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            cursor.execute(f"SELECT COUNT(*) FROM {_quote_ident(table)}")
             total_rows = cursor.fetchone()[0]
             print(f"  Total rows: {total_rows:,}")
             
-            cursor.execute(f"SELECT * FROM {table}")
+            cursor.arraysize = FETCH_BATCH_SIZE
+            cursor.execute(f"SELECT * FROM {_quote_ident(table)}")
             row_count = 0
-            
-            for row in cursor.fetchall():
-                record = {
-                    "table": table,
-                    "id": row['id'],
-                    "timestamp": row['timestamp'],
-                    "session_id": row['session_id'],
-                    "endpoint": row['endpoint'],
-                    "method": row['method'],
-                    "status_code": row['status_code'],
-                    "response_time": row['response_time'],
-                    "error_message": row['error_message'],
-                    "raw_log": row['raw_log']
-                }
-                
-                f.write(json.dumps(record, ensure_ascii=False) + '\n')
-                row_count += 1
-                
-                if row_count % 50000 == 0:
-                    print(f"    Exported {row_count:,}/{total_rows:,} records")
+
+            while True:
+                rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    record = {
+                        "table": table,
+                        "id": row['id'],
+                        "timestamp": row['timestamp'],
+                        "session_id": row['session_id'],
+                        "endpoint": row['endpoint'],
+                        "method": row['method'],
+                        "status_code": row['status_code'],
+                        "response_time": row['response_time'],
+                        "error_message": row['error_message'],
+                        "raw_log": row['raw_log']
+                    }
+
+                    buf += _dumps_line(record)
+                    if len(buf) >= WRITE_FLUSH_THRESHOLD:
+                        f.write(buf)
+                        buf.clear()
+                    row_count += 1
+
+                    if row_count % 50000 == 0:
+                        print(f"    Exported {row_count:,}/{total_rows:,} records")
             
             print(f"  ✅ Exported {row_count:,} records from {table}")
-    
-    conn.close()
+        if buf:
+            f.write(buf)
+
+    _close_db(conn)
     
     size_mb = output_path.stat().st_size / (1024 * 1024)
     print(f"✅ Main activity database exported: {output_path} ({size_mb:.1f} MB)")
@@ -165,8 +277,8 @@ if __name__ == "__main__":
     print("📊 JSONL Export Summary:")
     print("="*50)
     
-    # List all JSONL files created
-    jsonl_files = list(Path("/Users/hamidaho/Desktop/new_experiments").glob("*.jsonl"))
+    # List all JSONL files created (plain and zstd-compressed)
+    jsonl_files = list(Path("/Users/hamidaho/Desktop/new_experiments").glob("*.jsonl*"))
     for file in jsonl_files:
         size_mb = file.stat().st_size / (1024 * 1024)
         print(f"📁 {file.name} ({size_mb:.1f} MB)")
@@ -7,153 +7,178 @@ Extracts comprehensive cursor interaction data from state databases
 import sqlite3
 import json
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Any
 
+def _open_db(db_path) -> sqlite3.Connection:
+    """Open a database read-only with performance PRAGMAs applied
+
+    Read-only mode avoids creating -wal/-shm side files next to the
+    source database; the PRAGMAs trade the tiny default page cache for
+    one sized to repeated full-table scans over multi-GB databases.
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    for pragma in ("synchronous=NORMAL",
+                   "cache_size=-262144",  # 256 MB page cache
+                   "mmap_size=30000000000",
+                   "temp_store=MEMORY"):
+        try:
+            conn.execute(f"PRAGMA {pragma}")
+        except sqlite3.Error:
+            pass
+    return conn
+
+def _close_db(conn: sqlite3.Connection):
+    """Close a connection, letting SQLite refresh planner stats first"""
+    try:
+        conn.execute("PRAGMA optimize")
+    except sqlite3.Error:
+        pass
+    conn.close()
+
+# Optional: orjson serializes records several times faster than stdlib
+# json and emits bytes directly
+try:
+    import orjson
+    def _dumps_line(record: Dict) -> bytes:
+        return orjson.dumps(record, default=str) + b'\n'
+except ImportError:
+    def _dumps_line(record: Dict) -> bytes:
+        return (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+
+WORKSPACE_STORAGE_ROOT = Path("/Users/hamidaho/Desktop/new_experiments/comprehensive_real_time_export/User/workspaceStorage")
+
+def _list_state_dbs() -> List[Path]:
+    """Find workspace state databases with a single directory scan"""
+    if not WORKSPACE_STORAGE_ROOT.exists():
+        return []
+    return [Path(entry.path) / "state.vscdb"
+            for entry in os.scandir(WORKSPACE_STORAGE_ROOT)
+            if entry.is_dir() and os.path.exists(os.path.join(entry.path, "state.vscdb"))]
+
+# Key classification buckets, matching the LIKE '%...%' filters the
+# extraction previously ran as separate full-table queries
+KEY_BUCKETS = [
+    ("ai_prompts", re.compile(r"prompt|ai|chat", re.IGNORECASE)),
+    ("file_searches", re.compile(r"search|file", re.IGNORECASE)),
+    ("code_context", re.compile(r"code|editor|context", re.IGNORECASE)),
+]
+
+def _extract_workspace(db_path: str) -> Dict:
+    """Extract AI prompts, file searches and code context from one workspace
+
+    Module-level so it can be dispatched to worker processes - each
+    workspace database is independent and extraction is dominated by
+    SQLite reads plus JSON parsing.
+    """
+    workspace_id = Path(db_path).parent.name
+    result = {
+        "records": [],
+        "workspace_info": None
+    }
+
+    conn = _open_db(db_path)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+
+    # Get workspace info
+    workspace_info = {
+        "workspace_id": workspace_id,
+        "database_path": str(db_path),
+        "tables": []
+    }
+
+    # Get all tables
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = [row[0] for row in cursor.fetchall()]
+    workspace_info["tables"] = tables
+
+    # One scan over ItemTable classifies every key in Python; the four
+    # previous LIKE '%...%' queries were each full table scans anyway,
+    # and the value is decoded once per row instead of up to four times
+    if 'ItemTable' in tables:
+        cursor.execute("SELECT key, value FROM ItemTable")
+        for row in cursor.fetchall():
+            key = row['key']
+            raw_value = row['value']
+            record = {
+                "workspace_id": workspace_id,
+                "key": key,
+            }
+            # Storing both the decoded value and the raw string doubled
+            # memory per row; keep the raw form only when decoding fails
+            try:
+                record["value"] = json.loads(raw_value) if raw_value else None
+            except:
+                record["value"] = None
+                record["raw_value"] = raw_value
+            record["buckets"] = [bucket for bucket, pattern in KEY_BUCKETS
+                                 if pattern.search(key)]
+            result["records"].append(record)
+
+    workspace_info["total_items"] = len(result["records"])
+    result["workspace_info"] = workspace_info
+
+    _close_db(conn)
+    return result
+
 def export_detailed_cursor_data():
     """Export detailed cursor interaction data including file searches, AI prompts, and code context"""
-    
+
     # Find all state databases
-    state_dbs = list(Path("/Users/hamidaho/Desktop/new_experiments/comprehensive_real_time_export/User/workspaceStorage").glob("*/state.vscdb"))
-    
+    state_dbs = _list_state_dbs()
+
     print(f"📊 Found {len(state_dbs)} workspace state databases")
-    
-    export_data = {
-        "metadata": {
+
+    counts = {"ai_prompts": 0, "file_searches": 0, "code_context": 0,
+              "chat_interactions": 0, "workspaces": 0}
+
+    # Stream records to JSONL as workspaces complete, keeping only
+    # counters in memory instead of the whole dataset
+    output_file = Path("/Users/hamidaho/Desktop/new_experiments/detailed_cursor_interactions.jsonl")
+    with open(output_file, 'wb') as f:
+        f.write(_dumps_line({
+            "record_type": "metadata",
             "export_time": datetime.now().isoformat(),
             "total_workspaces": len(state_dbs),
             "export_type": "DETAILED_CURSOR_INTERACTIONS"
-        },
-        "ai_prompts": [],
-        "file_searches": [],
-        "chat_interactions": [],
-        "code_context": [],
-        "workspace_data": []
-    }
-    
-    for db_path in state_dbs:
-        workspace_id = db_path.parent.name
-        print(f"🔍 Processing workspace: {workspace_id}")
-        
-        try:
-            conn = sqlite3.connect(str(db_path))
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            # Get workspace info
-            workspace_info = {
-                "workspace_id": workspace_id,
-                "database_path": str(db_path),
-                "tables": []
-            }
-            
-            # Get all tables
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [row[0] for row in cursor.fetchall()]
-            workspace_info["tables"] = tables
-            
-            # Extract AI prompts
-            if 'ItemTable' in tables:
-                cursor.execute("SELECT key, value FROM ItemTable WHERE key LIKE '%prompt%' OR key LIKE '%ai%' OR key LIKE '%chat%'")
-                for row in cursor.fetchall():
-                    try:
-                        value_data = json.loads(row['value']) if row['value'] else None
-                        export_data["ai_prompts"].append({
-                            "workspace_id": workspace_id,
-                            "key": row['key'],
-                            "value": value_data,
-                            "raw_value": row['value']
-                        })
-                    except:
-                        export_data["ai_prompts"].append({
-                            "workspace_id": workspace_id,
-                            "key": row['key'],
-                            "value": row['value'],
-                            "raw_value": row['value']
-                        })
-            
-            # Extract file search data
-            if 'ItemTable' in tables:
-                cursor.execute("SELECT key, value FROM ItemTable WHERE key LIKE '%search%' OR key LIKE '%file%'")
-                for row in cursor.fetchall():
-                    try:
-                        value_data = json.loads(row['value']) if row['value'] else None
-                        export_data["file_searches"].append({
-                            "workspace_id": workspace_id,
-                            "key": row['key'],
-                            "value": value_data,
-                            "raw_value": row['value']
-                        })
-                    except:
-                        export_data["file_searches"].append({
-                            "workspace_id": workspace_id,
-                            "key": row['key'],
-                            "value": row['value'],
-                            "raw_value": row['value']
-                        })
-            
-            # Extract code context data
-            if 'ItemTable' in tables:
-                cursor.execute("SELECT key, value FROM ItemTable WHERE key LIKE '%code%' OR key LIKE '%editor%' OR key LIKE '%context%'")
-                for row in cursor.fetchall():
-                    try:
-                        value_data = json.loads(row['value']) if row['value'] else None
-                        export_data["code_context"].append({
-                            "workspace_id": workspace_id,
-                            "key": row['key'],
-                            "value": value_data,
-                            "raw_value": row['value']
-                        })
-                    except:
-                        export_data["code_context"].append({
-                            "workspace_id": workspace_id,
-                            "key": row['key'],
-                            "value": row['value'],
-                            "raw_value": row['value']
-                        })
-            
-            # Extract all other data
-            if 'ItemTable' in tables:
-                cursor.execute("SELECT key, value FROM ItemTable")
-                for row in cursor.fetchall():
-                    try:
-                        value_data = json.loads(row['value']) if row['value'] else None
-                        export_data["chat_interactions"].append({
-                            "workspace_id": workspace_id,
-                            "key": row['key'],
-                            "value": value_data,
-                            "raw_value": row['value']
-                        })
-                    except:
-                        export_data["chat_interactions"].append({
-                            "workspace_id": workspace_id,
-                            "key": row['key'],
-                            "value": row['value'],
-                            "raw_value": row['value']
-                        })
-            
-            workspace_info["total_items"] = len(export_data["chat_interactions"])
-            export_data["workspace_data"].append(workspace_info)
-            
-            conn.close()
-            
-        except Exception as e:
-            print(f"⚠️  Error processing {workspace_id}: {e}")
-    
-    # Save to JSON file
-    output_file = Path("/Users/hamidaho/Desktop/new_experiments/detailed_cursor_interactions.json")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(export_data, f, indent=2, ensure_ascii=False)
-    
+        }))
+
+        # Workspaces are independent, so fan extraction out across cores;
+        # processes (not threads) because SQLite connections can't be shared
+        # and JSON parsing is CPU-bound
+        with ProcessPoolExecutor() as executor:
+            futures = {executor.submit(_extract_workspace, str(db_path)): db_path
+                       for db_path in state_dbs}
+            for future in as_completed(futures):
+                db_path = futures[future]
+                workspace_id = db_path.parent.name
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"⚠️  Error processing {workspace_id}: {e}")
+                    continue
+                print(f"🔍 Processed workspace: {workspace_id}")
+                f.write(_dumps_line({"record_type": "workspace_data",
+                                     **result["workspace_info"]}))
+                for record in result["records"]:
+                    counts["chat_interactions"] += 1
+                    for bucket in record["buckets"]:
+                        counts[bucket] += 1
+                    f.write(_dumps_line(record))
+                counts["workspaces"] += 1
+
     print(f"✅ Detailed export completed: {output_file}")
     print(f"📊 Export statistics:")
-    print(f"  AI Prompts: {len(export_data['ai_prompts'])}")
-    print(f"  File Searches: {len(export_data['file_searches'])}")
-    print(f"  Code Context: {len(export_data['code_context'])}")
-    print(f"  Total Interactions: {len(export_data['chat_interactions'])}")
-    print(f"  Workspaces: {len(export_data['workspace_data'])}")
-    
+    print(f"  AI Prompts: {counts['ai_prompts']}")
+    print(f"  File Searches: {counts['file_searches']}")
+    print(f"  Code Context: {counts['code_context']}")
+    print(f"  Total Interactions: {counts['chat_interactions']}")
+    print(f"  Workspaces: {counts['workspaces']}")
+
     return output_file
 
 if __name__ == "__main__":
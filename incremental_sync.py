@@ -4,20 +4,47 @@ Incremental Cursor Dataset Sync
 Handles large datasets with incremental updates and efficient syncing
 """
 
-import os
 import sys
 import json
+import mmap
 import sqlite3
-import hashlib
 import subprocess
-import time
 import logging
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Any
+from typing import Dict, List
 import argparse
-import tempfile
-import shutil
+
+# Optional: orjson reads/writes the large export JSON files several
+# times faster than stdlib json; fall back to json when not installed
+try:
+    import orjson
+    def _read_json(path):
+        # Memory-map the file so orjson parses straight out of the page
+        # cache - no read() copy and no text-decode pass, which matters
+        # for multi-hundred-MB legacy full exports
+        with open(path, 'rb') as f:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return orjson.loads(mm)
+            except ValueError:  # empty files can't be mapped
+                return orjson.loads(f.read())
+    def _write_json(path, obj):
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, default=str, option=orjson.OPT_INDENT_2))
+    def _dumps_line(record) -> bytes:
+        return orjson.dumps(record, default=str) + b'\n'
+except ImportError:
+    def _read_json(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    def _write_json(path, obj):
+        with open(path, 'w') as f:
+            json.dump(obj, f, indent=2, default=str)
+    def _dumps_line(record) -> bytes:
+        return (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8')
 
 # Configure logging
 logging.basicConfig(
@@ -39,7 +66,11 @@ class IncrementalSync:
         self.hf_repo = hf_repo
         self.batch_size = batch_size
         self.state_file = Path("incremental_sync_state.json")
+        self.full_export_file = Path("cursor_activity_FULL_export.jsonl")
+        self.full_export_meta_file = Path("cursor_activity_FULL_export.meta.json")
         self.last_sync_state = self.load_sync_state()
+        self._columns_cache: Dict[str, List[str]] = {}
+        self._merge_lock = threading.Lock()
         
         # Database configurations
         self.databases = {
@@ -59,12 +90,41 @@ class IncrementalSync:
             }
         }
 
+        # Incremental SELECT statements, built once; sqlite3 keeps a
+        # per-connection statement cache keyed on the SQL text, so
+        # reusing the identical string avoids re-preparing each cycle
+        self._select_sql = {
+            name: (f"SELECT * FROM api_activity "
+                   f"WHERE {info['primary_key']} > ? "
+                   f"ORDER BY {info['primary_key']} LIMIT ?")
+            for name, info in self.databases.items()
+        }
+
+    def _open(self, db_path: Path) -> sqlite3.Connection:
+        """Open a source database read-only with tuned PRAGMAs
+
+        Read-only URI mode means the sync never blocks Cursor's own
+        writers or creates -wal/-shm side files; the PRAGMAs replace the
+        2 MB default page cache for the incremental scans. journal_mode
+        can't be changed on a read-only connection, so it is left alone.
+        """
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True,
+                               isolation_level=None)
+        for pragma in ("synchronous=NORMAL",
+                       "temp_store=MEMORY",
+                       "mmap_size=268435456",
+                       "cache_size=-65536"):  # 64 MB page cache
+            try:
+                conn.execute(f"PRAGMA {pragma}")
+            except sqlite3.Error:
+                pass
+        return conn
+
     def load_sync_state(self) -> Dict:
         """Load incremental sync state"""
         if self.state_file.exists():
             try:
-                with open(self.state_file, 'r') as f:
-                    return json.load(f)
+                return _read_json(self.state_file)
             except Exception as e:
                 logger.warning(f"Failed to load sync state: {e}")
         return {}
@@ -72,15 +132,14 @@ class IncrementalSync:
     def save_sync_state(self, state: Dict):
         """Save incremental sync state"""
         try:
-            with open(self.state_file, 'w') as f:
-                json.dump(state, f, indent=2)
+            _write_json(self.state_file, state)
         except Exception as e:
             logger.error(f"Failed to save sync state: {e}")
 
     def get_database_max_id(self, db_path: Path, primary_key: str) -> int:
         """Get maximum ID from database"""
         try:
-            conn = sqlite3.connect(str(db_path))
+            conn = self._open(db_path)
             cursor = conn.cursor()
             cursor.execute(f"SELECT MAX({primary_key}) FROM api_activity")
             result = cursor.fetchone()
@@ -104,37 +163,34 @@ class IncrementalSync:
             # Get last synced ID
             last_id = self.last_sync_state.get(f"{db_name}_last_id", 0)
             
-            conn = sqlite3.connect(str(db_path))
+            conn = self._open(db_path)
             cursor = conn.cursor()
-            
+
             # Get new records since last sync
-            query = f"""
-            SELECT * FROM api_activity 
-            WHERE {primary_key} > ? 
-            ORDER BY {primary_key} 
-            LIMIT ?
-            """
-            
-            cursor.execute(query, (last_id, self.batch_size))
-            rows = cursor.fetchall()
-            
-            # Get column names
-            cursor.execute("PRAGMA table_info(api_activity)")
-            columns = [column[1] for column in cursor.fetchall()]
-            
-            # Convert to dictionaries
+            cursor.execute(self._select_sql[db_name], (last_id, self.batch_size))
+
+            # Column names come free from cursor.description after the
+            # execute; cache them per database since the schema doesn't
+            # change between sync cycles
+            columns = self._columns_cache.get(db_name)
+            if columns is None:
+                columns = [d[0] for d in cursor.description]
+                self._columns_cache[db_name] = columns
+            pk_index = columns.index(primary_key)
+
+            # Stream rows straight off the cursor
             new_data = []
             max_id = last_id
-            for row in rows:
+            for row in cursor:
                 new_data.append(dict(zip(columns, row)))
-                max_id = max(max_id, row[0])  # Assuming first column is ID
-            
+                max_id = max(max_id, row[pk_index])
+
             conn.close()
             
-            # Update sync state
+            # Update in-memory sync state; it is persisted once at the
+            # end of the sync cycle rather than once per database
             self.last_sync_state[f"{db_name}_last_id"] = max_id
-            self.save_sync_state(self.last_sync_state)
-            
+
             return {
                 "database": db_name,
                 "incremental": True,
@@ -159,8 +215,7 @@ class IncrementalSync:
             
             # Save incremental export
             json_path = Path(db_info["json_export"])
-            with open(json_path, 'w') as f:
-                json.dump(incremental_data, f, indent=2, default=str)
+            _write_json(json_path, incremental_data)
             
             logger.info(f"Created incremental export: {json_path} ({incremental_data['new_records']} records)")
             return True
@@ -169,55 +224,79 @@ class IncrementalSync:
             logger.error(f"Failed to create incremental export for {db_name}: {e}")
             return False
 
+    def _migrate_legacy_full_export(self, db_name: str) -> Dict:
+        """One-time conversion of the old monolithic JSON full export
+
+        Streams the records out of cursor_activity_FULL_export.json into
+        the JSONL file and returns its metadata so history carries over.
+        """
+        legacy_file = Path("cursor_activity_FULL_export.json")
+        meta = {
+            "database": db_name,
+            "export_timestamp": datetime.now().isoformat(),
+            "total_records": 0,
+            "incremental_updates": []
+        }
+        if not legacy_file.exists():
+            return meta
+
+        logger.info(f"Migrating legacy full export to JSONL: {legacy_file}")
+        legacy_data = _read_json(legacy_file)
+        with open(self.full_export_file, 'ab') as f:
+            for record in legacy_data.get("data", []):
+                f.write(_dumps_line(record))
+        meta["database"] = legacy_data.get("database", db_name)
+        meta["total_records"] = len(legacy_data.get("data", []))
+        meta["incremental_updates"] = legacy_data.get("incremental_updates", [])
+        legacy_file.unlink()
+        return meta
+
     def merge_incremental_data(self, db_name: str, db_info: Dict) -> bool:
-        """Merge incremental data with existing full export"""
+        """Append incremental data to the JSONL full export
+
+        The full export is JSON-Lines, so a sync cycle only appends the
+        new records (O(batch) I/O) instead of rewriting the whole file.
+        Totals and update history live in a small .meta.json sidecar.
+        """
         try:
             incremental_file = Path(db_info["json_export"])
-            full_export_file = Path(f"cursor_activity_FULL_export.json")
-            
+
             if not incremental_file.exists():
                 logger.warning(f"Incremental file not found: {incremental_file}")
                 return False
-            
+
             # Load incremental data
-            with open(incremental_file, 'r') as f:
-                incremental_data = json.load(f)
-            
+            incremental_data = _read_json(incremental_file)
+
             if not incremental_data.get("data"):
                 logger.info(f"No new data to merge for {db_name}")
                 return True
-            
-            # Load or create full export
-            if full_export_file.exists():
-                with open(full_export_file, 'r') as f:
-                    full_data = json.load(f)
+
+            # Load sidecar metadata, migrating the old monolithic JSON
+            # export the first time through
+            if self.full_export_meta_file.exists():
+                meta = _read_json(self.full_export_meta_file)
             else:
-                full_data = {
-                    "database": db_name,
-                    "export_timestamp": datetime.now().isoformat(),
-                    "total_records": 0,
-                    "incremental_updates": [],
-                    "data": []
-                }
-            
-            # Add incremental data
-            full_data["data"].extend(incremental_data["data"])
-            full_data["total_records"] = len(full_data["data"])
-            full_data["incremental_updates"].append({
+                meta = self._migrate_legacy_full_export(db_name)
+
+            # Append the new records
+            with open(self.full_export_file, 'ab') as f:
+                for record in incremental_data["data"]:
+                    f.write(_dumps_line(record))
+
+            meta["total_records"] = meta.get("total_records", 0) + incremental_data["new_records"]
+            meta.setdefault("incremental_updates", []).append({
                 "timestamp": incremental_data["export_timestamp"],
                 "new_records": incremental_data["new_records"],
                 "last_id": incremental_data["last_synced_id"],
                 "max_id": incremental_data["new_max_id"]
             })
-            full_data["export_timestamp"] = datetime.now().isoformat()
-            
-            # Save merged data
-            with open(full_export_file, 'w') as f:
-                json.dump(full_data, f, indent=2, default=str)
-            
+            meta["export_timestamp"] = datetime.now().isoformat()
+            _write_json(self.full_export_meta_file, meta)
+
             logger.info(f"Merged {incremental_data['new_records']} new records into full export")
             return True
-            
+
         except Exception as e:
             logger.error(f"Failed to merge incremental data for {db_name}: {e}")
             return False
@@ -225,10 +304,10 @@ class IncrementalSync:
     def sync_to_huggingface(self, changed_files: List[str]) -> bool:
         """Sync changed files to Hugging Face"""
         try:
-            # Add files to git
-            for file in changed_files:
-                subprocess.run(["git", "add", file], check=True)
-            
+            # Stage everything in one git invocation instead of one
+            # fork/exec plus index rewrite per file
+            subprocess.run(["git", "add", "--"] + changed_files, check=True)
+
             # Check if there are changes
             result = subprocess.run(["git", "diff", "--cached", "--quiet"], 
                                   capture_output=True)
@@ -253,25 +332,45 @@ class IncrementalSync:
             logger.error(f"Failed to sync to Hugging Face: {e}")
             return False
 
+    def _sync_database(self, db_name: str, db_info: Dict) -> List[str]:
+        """Extract and merge one database, returning the files it changed"""
+        changed = []
+        if self.create_incremental_export(db_name, db_info):
+            changed.append(db_info["json_export"])
+
+            # Merge with full export; the JSONL file and meta sidecar
+            # are shared across databases, so merges are serialized
+            with self._merge_lock:
+                if self.merge_incremental_data(db_name, db_info):
+                    changed.append(str(self.full_export_file))
+                    changed.append(str(self.full_export_meta_file))
+        return changed
+
     def run_incremental_sync(self) -> bool:
         """Run incremental sync cycle"""
         logger.info("Starting incremental sync...")
-        
+
         changed_files = []
-        
-        # Process each database
-        for db_name, db_info in self.databases.items():
-            if not db_info["path"].exists():
-                continue
-            
-            # Create incremental export
-            if self.create_incremental_export(db_name, db_info):
-                changed_files.append(db_info["json_export"])
-                
-                # Merge with full export
-                if self.merge_incremental_data(db_name, db_info):
-                    changed_files.append("cursor_activity_FULL_export.json")
-        
+
+        # The databases are independent SQLite files and sqlite3 releases
+        # the GIL during reads, so extract them in parallel; only the git
+        # sync at the end has to run in sequence. Sync state is written
+        # once per cycle in the finally, not once per database, and
+        # survives a failed extraction so completed work isn't redone.
+        try:
+            pending = {name: info for name, info in self.databases.items()
+                       if info["path"].exists()}
+            if pending:
+                with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                    futures = [executor.submit(self._sync_database, name, info)
+                               for name, info in pending.items()]
+                    for future in futures:
+                        for file in future.result():
+                            if file not in changed_files:
+                                changed_files.append(file)
+        finally:
+            self.save_sync_state(self.last_sync_state)
+
         if not changed_files:
             logger.info("No incremental changes detected")
             return True
@@ -6,15 +6,107 @@ Web-based monitoring and control interface for automated syncing
 
 import os
 import sys
+import gzip
 import json
 import time
+import hashlib
+import signal
 import sqlite3
 import subprocess
+import threading
+from collections import deque
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Any
 import argparse
-from flask import Flask, render_template_string, jsonify, request
+import queue
+from flask import Flask, jsonify, request, Response
+
+# Optional: psutil checks for the sync process in-process instead of
+# forking pgrep on every status poll
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Optional: waitress is a threaded production WSGI server; Flask's dev
+# server handles one request at a time, so concurrent dashboard viewers
+# queue behind each other's polls
+try:
+    from waitress import serve as waitress_serve
+except ImportError:
+    waitress_serve = None
+
+def tjit(*args, **kwargs):
+    """Conditionally JIT-compile a numeric helper with Numba
+
+    Decorate future aggregation loops (percentiles or sums over record
+    counts across many databases) with @tjit(cache=True); when numba
+    isn't installed the function runs as plain Python. Trivial per-call
+    helpers like format_size should stay un-jitted - the dispatch
+    overhead would exceed their work.
+    """
+    try:
+        from numba import njit
+    except ImportError:
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+    return njit(*args, **kwargs)
+
+# git log output cached for a few seconds and shared across concurrent
+# requests; commits don't land at 30-second-poll resolution, so each
+# viewer doesn't need its own fork + repo walk
+_GIT_CACHE_TTL = 10  # seconds
+_git_cache: Dict[str, tuple] = {}
+_git_cache_lock = threading.Lock()
+
+def _cached_git(key: str, args: List[str]) -> str:
+    """Run a git command at most once per TTL window"""
+    now = time.monotonic()
+    with _git_cache_lock:
+        hit = _git_cache.get(key)
+        if hit and now - hit[0] < _GIT_CACHE_TTL:
+            return hit[1]
+    result = subprocess.run(["git"] + args,
+                            capture_output=True, text=True, cwd=".")
+    value = result.stdout.strip() if result.returncode == 0 else ""
+    with _git_cache_lock:
+        _git_cache[key] = (now, value)
+    return value
+
+# Recent activity ring buffer. The activity endpoint reads this
+# in-process list instead of shelling out to git on every poll, and the
+# maxlen bound keeps a long-lived dashboard from growing it forever
+_RECENT: deque = deque(maxlen=50)
+_RECENT_LOCK = threading.Lock()
+
+# Concurrent SSE streams allowed; half the waitress pool stays free for
+# the regular endpoints no matter how many dashboard tabs are open
+_SSE_MAX_CLIENTS = 4
+
+def _record_activity(message: str):
+    """Append an entry to the bounded recent-activity buffer"""
+    with _RECENT_LOCK:
+        _RECENT.appendleft({
+            "timestamp": datetime.now().strftime("%H:%M:%S"),
+            "message": message
+        })
+
+def _sync_process_running() -> bool:
+    """Check whether the auto-sync script is running"""
+    if psutil is not None:
+        for proc in psutil.process_iter(['cmdline']):
+            try:
+                if any('auto_sync_datasets.py' in part
+                       for part in (proc.info['cmdline'] or [])):
+                    return True
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return False
+    result = subprocess.run(["pgrep", "-f", "auto_sync_datasets.py"],
+                            capture_output=True, text=True)
+    return result.returncode == 0
 
 # Dashboard HTML template
 DASHBOARD_TEMPLATE = """
@@ -98,9 +190,20 @@ DASHBOARD_TEMPLATE = """
                 });
         }
         
-        // Auto-refresh every 30 seconds
-        setInterval(refreshData, 30000);
-        
+        // Stream updates over SSE so idle tabs cost nothing; fall back
+        // to 30-second polling when EventSource is unavailable
+        if (window.EventSource) {
+            const source = new EventSource('/api/stream');
+            source.onmessage = e => updateDashboard(JSON.parse(e.data));
+            source.onerror = () => {
+                // Server caps concurrent streams; drop to polling
+                source.close();
+                setInterval(refreshData, 30000);
+            };
+        } else {
+            setInterval(refreshData, 30000);
+        }
+
         // Initial load
         refreshData();
     </script>
@@ -156,6 +259,13 @@ DASHBOARD_TEMPLATE = """
 </html>
 """
 
+# The dashboard page is fully static, so encode, compress and tag it
+# once at import instead of running it through Jinja on every hit; the
+# plain bytes stay around for clients that don't accept gzip
+_DASHBOARD_PLAIN = DASHBOARD_TEMPLATE.encode('utf-8')
+_DASHBOARD_GZ = gzip.compress(_DASHBOARD_PLAIN, 9)
+_DASHBOARD_ETAG = hashlib.md5(_DASHBOARD_GZ).hexdigest()
+
 class SyncDashboard:
     def __init__(self, 
                  source_dir: str = "/Users/hamidaho/Desktop/new_experiments",
@@ -165,56 +275,223 @@ class SyncDashboard:
         self.hf_repo = hf_repo
         self.port = port
         self.app = Flask(__name__)
-        self.setup_routes()
-    
-    def get_database_info(self) -> List[Dict]:
-        """Get database information"""
-        databases = []
-        
-        db_configs = [
+        # get_database_info results keyed by path -> ((mtime_ns, size),
+        # info); a database whose stat fingerprint hasn't moved since the
+        # last status poll skips the connect + COUNT entirely
+        self._db_info_cache: Dict[str, tuple] = {}
+        # Paths where the meta row-count table has been set up (or the
+        # attempt failed; either way don't retry every poll)
+        self._meta_ready = set()
+        # waitress dispatches requests across threads, so cache updates
+        # and the shared count connection need to be serialized
+        self._db_info_lock = threading.Lock()
+        self.db_configs = [
             ("cursor_api_activity.db", self.source_dir / "cursor_api_analysis" / "cursor_api_activity.db"),
             ("prompt_versions.db", self.source_dir / "prompt_versions" / "prompt_versions.db"),
             ("enhanced_prompt_versions.db", self.source_dir / "enhanced_cursor_export" / "prompt_versions.db")
         ]
-        
+        # SSE subscribers: one queue per connected /api/stream client
+        self._subscribers = set()
+        self._subscribers_lock = threading.Lock()
+        # Per-thread count connection, kept open across polls so each
+        # poll skips the header + sqlite_master parse of a fresh open
+        self._conns = threading.local()
+        # Pid of the last manually triggered sync, so stop-sync can
+        # target it precisely instead of pattern-matching processes
+        self._sync_pid = None
+        self.setup_routes()
+
+    def _thread_conn(self) -> sqlite3.Connection:
+        """Get this thread's long-lived read-only count connection"""
+        conn = getattr(self._conns, 'conn', None)
+        if conn is None:
+            # No atexit close: that would run on the main thread and
+            # trip sqlite3's same-thread check for connections created
+            # on worker threads; process exit reclaims them anyway
+            conn = sqlite3.connect(":memory:", uri=True)
+            conn.execute("PRAGMA query_only=1")
+            self._conns.conn = conn
+            self._conns.attached = {}
+        return conn
+
+    def _attach(self, conn: sqlite3.Connection, path: Path) -> str:
+        """Attach a database read-only once per thread, returning its alias
+
+        The fingerprint cache already routes only changed databases
+        here, and an attached read-only connection sees committed
+        changes without re-attaching.
+        """
+        attached = self._conns.attached
+        alias = attached.get(str(path))
+        if alias is None:
+            alias = f"db{len(attached)}"
+            conn.execute(f"ATTACH DATABASE 'file:{path}?mode=ro' AS {alias}")
+            attached[str(path)] = alias
+        return alias
+
+    def _status_payload(self) -> Dict:
+        """Build the full status document served to dashboard clients"""
+        databases = self.get_database_info()
+        return {
+            **self.get_sync_status(db_info=databases),
+            "databases": databases,
+            "recent_activity": self.get_recent_activity()
+        }
+
+    def _broadcast_status(self):
+        """Push the current status to every SSE subscriber"""
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        if not subscribers:
+            return
+        data = json.dumps(self._status_payload())
+        for q in subscribers:
+            try:
+                q.put_nowait(data)
+            except queue.Full:
+                pass  # slow client; it will catch up on the next push
+
+    def _watch_changes(self):
+        """Push status over SSE whenever a database file changes
+
+        Watching the stat fingerprints costs a few stat calls every two
+        seconds, so idle dashboards trigger no SQLite or subprocess work
+        at all - pushes happen only when something actually moved.
+        """
+        last = None
+        while True:
+            time.sleep(2)
+            with self._subscribers_lock:
+                if not self._subscribers:
+                    continue
+            current = []
+            for _, path in self.db_configs:
+                try:
+                    st = path.stat()
+                    current.append((st.st_mtime_ns, st.st_size))
+                except OSError:
+                    current.append(None)
+            if current != last:
+                last = current
+                try:
+                    self._broadcast_status()
+                except Exception:
+                    pass
+
+    def _ensure_row_count_meta(self, path: Path):
+        """Set up a trigger-maintained row count in the database
+
+        COUNT(*) scans the whole table on every poll; a one-row
+        meta(key, value) table kept current by INSERT/DELETE triggers
+        turns that into a single B-tree lookup. Runs once per database
+        and needs a brief writable connection; failure (e.g. the file is
+        locked or on read-only media) just leaves the COUNT fallback.
+        """
+        try:
+            conn = sqlite3.connect(str(path), timeout=1)
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+                conn.execute(
+                    "INSERT OR IGNORE INTO meta (key, value) "
+                    "SELECT 'row_count', COUNT(*) FROM api_activity")
+                conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS api_activity_rc_ins "
+                    "AFTER INSERT ON api_activity BEGIN "
+                    "UPDATE meta SET value = value + 1 WHERE key = 'row_count'; END")
+                conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS api_activity_rc_del "
+                    "AFTER DELETE ON api_activity BEGIN "
+                    "UPDATE meta SET value = value - 1 WHERE key = 'row_count'; END")
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _count_records(self, cursor: sqlite3.Cursor, alias: str = "main") -> int:
+        """Read the maintained row count, falling back to COUNT(*)"""
+        try:
+            row = cursor.execute(
+                f"SELECT value FROM {alias}.meta WHERE key = 'row_count'").fetchone()
+            if row is not None:
+                return row[0]
+        except sqlite3.Error:
+            pass
+        cursor.execute(f"SELECT COUNT(*) FROM {alias}.api_activity")
+        return cursor.fetchone()[0]
+
+    def get_database_info(self) -> List[Dict]:
+        """Get database information"""
+        with self._db_info_lock:
+            return self._get_database_info_locked()
+
+    def _get_database_info_locked(self) -> List[Dict]:
+        databases = []
+        db_configs = self.db_configs
+
+        # First pass: serve cache hits and collect the databases whose
+        # fingerprint moved, so they can share one connection below
+        stale = []
         for name, path in db_configs:
-            if path.exists():
+            # One os.stat covers both the existence check and the
+            # fingerprint; exists()+stat() would issue the syscall twice
+            try:
+                st = os.stat(path)
+                fingerprint = (st.st_mtime_ns, st.st_size)
+                cached = self._db_info_cache.get(str(path))
+                if cached and cached[0] == fingerprint:
+                    databases.append(cached[1])
+                    continue
+                databases.append(None)
+                stale.append((len(databases) - 1, name, path, st, fingerprint))
+            except FileNotFoundError:
+                databases.append({
+                    "name": name,
+                    "path": str(path),
+                    "size": "Not Found",
+                    "records": 0,
+                    "status": "warning"
+                })
+            except OSError:
+                databases.append({
+                    "name": name,
+                    "path": str(path),
+                    "size": "Unknown",
+                    "records": 0,
+                    "status": "error"
+                })
+
+        # Second pass: count the stale databases over this thread's
+        # long-lived connection, each attached read-only on first use
+        if stale:
+            conn = self._thread_conn()
+            cursor = conn.cursor()
+            for slot, name, path, st, fingerprint in stale:
                 try:
-                    # Get file size
-                    size = path.stat().st_size
-                    size_str = self.format_size(size)
-                    
-                    # Get record count
-                    conn = sqlite3.connect(str(path))
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT COUNT(*) FROM api_activity")
-                    records = cursor.fetchone()[0]
-                    conn.close()
-                    
-                    databases.append({
+                    if str(path) not in self._meta_ready:
+                        self._ensure_row_count_meta(path)
+                        self._meta_ready.add(str(path))
+
+                    alias = self._attach(conn, path)
+                    records = self._count_records(cursor, alias)
+
+                    info = {
                         "name": name,
                         "path": str(path),
-                        "size": size_str,
+                        "size": self.format_size(st.st_size),
                         "records": records,
                         "status": "success"
-                    })
-                except Exception as e:
-                    databases.append({
+                    }
+                    self._db_info_cache[str(path)] = (fingerprint, info)
+                    databases[slot] = info
+                except Exception:
+                    databases[slot] = {
                         "name": name,
                         "path": str(path),
                         "size": "Unknown",
                         "records": 0,
                         "status": "error"
-                    })
-            else:
-                databases.append({
-                    "name": name,
-                    "path": str(path),
-                    "size": "Not Found",
-                    "records": 0,
-                    "status": "warning"
-                })
-        
+                    }
+
         return databases
     
     def format_size(self, size_bytes: int) -> str:
@@ -225,26 +502,24 @@ class SyncDashboard:
             size_bytes /= 1024.0
         return f"{size_bytes:.1f} TB"
     
-    def get_sync_status(self) -> Dict:
-        """Get current sync status"""
+    def get_sync_status(self, db_info: List[Dict] = None) -> Dict:
+        """Get current sync status
+
+        Pass the result of get_database_info to avoid querying the
+        databases a second time in the same request.
+        """
         try:
             # Check if sync processes are running
-            result = subprocess.run(["pgrep", "-f", "auto_sync_datasets.py"], 
-                                  capture_output=True, text=True)
-            sync_running = result.returncode == 0
-            
+            sync_running = _sync_process_running()
+
             # Get total records
-            total_records = 0
-            for db_info in self.get_database_info():
-                total_records += db_info["records"]
-            
+            if db_info is None:
+                db_info = self.get_database_info()
+            total_records = sum(db["records"] for db in db_info)
+
             # Get last sync time (from git log)
-            try:
-                result = subprocess.run(["git", "log", "-1", "--format=%cd", "--date=iso"], 
-                                      capture_output=True, text=True, cwd=".")
-                last_sync = result.stdout.strip() if result.returncode == 0 else "Unknown"
-            except:
-                last_sync = "Unknown"
+            last_sync = _cached_git(
+                "last_sync", ["log", "-1", "--format=%cd", "--date=iso"]) or "Unknown"
             
             return {
                 "sync_running": sync_running,
@@ -261,49 +536,96 @@ class SyncDashboard:
             }
     
     def get_recent_activity(self) -> List[Dict]:
-        """Get recent sync activity"""
-        activities = []
-        
-        try:
-            # Get recent git commits
-            result = subprocess.run(["git", "log", "--oneline", "-10"], 
-                                  capture_output=True, text=True, cwd=".")
-            if result.returncode == 0:
-                for line in result.stdout.strip().split('\n'):
-                    if line:
-                        activities.append({
+        """Get recent sync activity from the bounded ring buffer
+
+        Commits made by the auto-sync and webhook processes arrive
+        through the TTL-cached git log: any line not yet in the buffer
+        is merged in alongside the dashboard's own events. The deque's
+        maxlen keeps memory bounded either way.
+        """
+        with _RECENT_LOCK:
+            try:
+                seen = {entry["message"] for entry in _RECENT}
+                lines = _cached_git("recent", ["log", "--oneline", "-10"]).split('\n')
+                for line in reversed(lines):
+                    if line and line not in seen:
+                        _RECENT.appendleft({
                             "timestamp": datetime.now().strftime("%H:%M:%S"),
                             "message": line
                         })
-        except:
-            pass
-        
-        return activities
+            except Exception:
+                pass
+            return list(_RECENT)
     
     def setup_routes(self):
         """Setup Flask routes"""
         
         @self.app.route('/')
         def dashboard():
-            return render_template_string(DASHBOARD_TEMPLATE)
+            if request.headers.get('If-None-Match') == _DASHBOARD_ETAG:
+                return '', 304
+            headers = {
+                'ETag': _DASHBOARD_ETAG,
+                'Cache-Control': 'public, max-age=300',
+                'Vary': 'Accept-Encoding'
+            }
+            if 'gzip' in request.headers.get('Accept-Encoding', ''):
+                headers['Content-Encoding'] = 'gzip'
+                body = _DASHBOARD_GZ
+            else:
+                body = _DASHBOARD_PLAIN
+            return Response(body, mimetype='text/html', headers=headers)
         
         @self.app.route('/api/status')
         def api_status():
-            return jsonify({
-                **self.get_sync_status(),
-                "databases": self.get_database_info(),
-                "recent_activity": self.get_recent_activity()
-            })
+            return jsonify(self._status_payload())
+
+        @self.app.route('/api/stream')
+        def api_stream():
+            # Each SSE client parks one waitress worker thread for the
+            # life of the tab; past the cap, refuse the stream so the
+            # browser drops to polling instead of the open tabs
+            # exhausting the fixed thread pool
+            q = queue.Queue(maxsize=4)
+            with self._subscribers_lock:
+                if len(self._subscribers) >= _SSE_MAX_CLIENTS:
+                    return Response("stream limit reached\n", status=503,
+                                    mimetype='text/plain',
+                                    headers={'Retry-After': '30'})
+                self._subscribers.add(q)
+
+            def generate():
+                try:
+                    while True:
+                        try:
+                            data = q.get(timeout=25)
+                        except queue.Empty:
+                            # Comment line keeps proxies from timing
+                            # the connection out
+                            yield ": keepalive\n\n"
+                            continue
+                        yield f"data: {data}\n\n"
+                finally:
+                    with self._subscribers_lock:
+                        self._subscribers.discard(q)
+            return Response(generate(), mimetype='text/event-stream')
         
         @self.app.route('/api/trigger-sync', methods=['POST'])
         def api_trigger_sync():
             try:
-                # Trigger sync by running the sync script
-                result = subprocess.run(["python3", "auto_sync_datasets.py", "--once"], 
-                                      capture_output=True, text=True, cwd=".")
+                # Launch the sync script detached and return at once;
+                # its output is discarded and progress surfaces through
+                # the SSE status stream as the databases change
+                proc = subprocess.Popen(
+                    [sys.executable, "auto_sync_datasets.py", "--once"],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                    cwd=".", start_new_session=True)
+                self._sync_pid = proc.pid
+                _record_activity("Manual sync triggered")
                 return jsonify({
-                    "status": "success",
-                    "message": "Sync triggered successfully"
+                    "status": "started",
+                    "pid": proc.pid,
+                    "message": "Sync started in background"
                 })
             except Exception as e:
                 return jsonify({
@@ -314,8 +636,17 @@ class SyncDashboard:
         @self.app.route('/api/stop-sync', methods=['POST'])
         def api_stop_sync():
             try:
-                # Stop sync processes
-                subprocess.run(["pkill", "-f", "auto_sync_datasets.py"])
+                # Prefer the pid we launched; fall back to pkill for
+                # syncs started outside this dashboard
+                if self._sync_pid is not None:
+                    try:
+                        os.kill(self._sync_pid, signal.SIGTERM)
+                    except ProcessLookupError:
+                        pass
+                    self._sync_pid = None
+                else:
+                    subprocess.run(["pkill", "-f", "auto_sync_datasets.py"])
+                _record_activity("Sync stopped")
                 return jsonify({
                     "status": "success",
                     "message": "Sync stopped successfully"
@@ -330,7 +661,11 @@ class SyncDashboard:
         """Run the dashboard"""
         print(f"🚀 Starting Cursor Dataset Sync Dashboard on port {self.port}")
         print(f"📊 Dashboard URL: http://localhost:{self.port}")
-        self.app.run(host='0.0.0.0', port=self.port, debug=False)
+        threading.Thread(target=self._watch_changes, daemon=True).start()
+        if waitress_serve is not None:
+            waitress_serve(self.app, host='0.0.0.0', port=self.port, threads=8)
+        else:
+            self.app.run(host='0.0.0.0', port=self.port, debug=False)
 
 def main():
     parser = argparse.ArgumentParser(description="Cursor Dataset Sync Dashboard")
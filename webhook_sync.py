@@ -9,16 +9,69 @@ import sys
 import json
 import time
 import logging
+import shutil
+import subprocess
 import threading
+import queue
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Callable
 import argparse
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+# Pick the native observer for the platform directly, skipping
+# watchdog's auto-detection; fall back to the default on anything else
+if sys.platform.startswith("linux"):
+    try:
+        from watchdog.observers.inotify import InotifyObserver as Observer
+    except ImportError:
+        from watchdog.observers import Observer
+elif sys.platform == "darwin":
+    try:
+        from watchdog.observers.fsevents import FSEventsObserver as Observer
+    except ImportError:
+        from watchdog.observers import Observer
+else:
+    from watchdog.observers import Observer
+from watchdog.events import PatternMatchingEventHandler
 import requests
 from flask import Flask, request, jsonify
 
+# Optional: waitress serves webhook requests across threads instead of
+# Flask's single-threaded dev server
+try:
+    from waitress import serve as waitress_serve
+except ImportError:
+    waitress_serve = None
+
+# Optional: xxhash fingerprints file content at multi-GB/s, so editors
+# and WAL checkpoints that bump mtimes without changing bytes don't
+# trigger a commit and push; hashlib's blake2b stands in without it
+try:
+    import xxhash
+    _new_hasher = xxhash.xxh3_64
+except ImportError:
+    import hashlib
+    def _new_hasher():
+        return hashlib.blake2b(digest_size=16)
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+def _content_hash(path) -> str:
+    """Hash a file's content in 1 MiB chunks"""
+    hasher = _new_hasher()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+# Optional: pygit2 stages and commits in-process through libgit2,
+# replacing two ~20ms git fork/execs per sync batch; the push stays a
+# subprocess either way since it's network-bound
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -30,43 +83,87 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class CursorFileHandler(FileSystemEventHandler):
-    """File system event handler for Cursor data changes"""
-    
+def _fast_copy(src: Path, dst: str):
+    """Bring dst up to date with src
+
+    A dst that is already hardlinked to src shares its inode, so there
+    is nothing to copy; likewise when size and mtime match. Otherwise a
+    hardlink is attempted first - zero file bytes moved when the source
+    and the repo share a filesystem, which matters for multi-hundred-MB
+    SQLite files - with shutil.copy2 as the fallback for cross-device
+    links. Whether the file needs staging is the caller's call (made on
+    content hash), not this function's.
+    """
+    try:
+        src_st = os.stat(src)
+        dst_st = os.stat(dst)
+        if os.path.samestat(src_st, dst_st):
+            return
+        if (dst_st.st_size == src_st.st_size
+                and dst_st.st_mtime_ns == src_st.st_mtime_ns):
+            return
+    except OSError:
+        pass
+    try:
+        if os.path.exists(dst):
+            os.unlink(dst)
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+class CursorFileHandler(PatternMatchingEventHandler):
+    """File system event handler for Cursor data changes
+
+    Filtering happens in watchdog's dispatch layer: only events whose
+    path matches a monitored file reach the Python callback, instead of
+    every event under the recursive watch.
+    """
+
+    # Keep at most this many debounce entries; oldest evicted first
+    _DEBOUNCE_MAX_ENTRIES = 1024
+
     def __init__(self, sync_callback: Callable):
+        super().__init__(
+            patterns=[
+                "*cursor_api_activity.db",
+                "*prompt_versions.db",
+                "*cursor_activity_export.json",
+                "*development_timeline.json",
+            ],
+            ignore_patterns=["*/.git/*", "*.tmp", "*~"],
+            ignore_directories=True,
+        )
         self.sync_callback = sync_callback
-        self.last_modified = {}
+        # Insertion-ordered so stale entries can be evicted from the
+        # front; keyed by path string (cheaper to hash than Path)
+        self.last_modified = OrderedDict()
         self.debounce_time = 5  # seconds
-        
+
     def on_modified(self, event):
-        if event.is_directory:
-            return
-        
-        file_path = Path(event.src_path)
-        current_time = time.time()
-        
+        # Monotonic time can't jump backwards under NTP adjustments
+        current_time = time.monotonic()
+
         # Debounce rapid file changes
-        if file_path in self.last_modified:
-            if current_time - self.last_modified[file_path] < self.debounce_time:
-                return
-        
-        self.last_modified[file_path] = current_time
-        
-        # Check if it's a monitored file
-        if self.is_monitored_file(file_path):
-            logger.info(f"File changed: {file_path}")
-            self.sync_callback(str(file_path))
-    
-    def is_monitored_file(self, file_path: Path) -> bool:
-        """Check if file should be monitored"""
-        monitored_patterns = [
-            "cursor_api_activity.db",
-            "prompt_versions.db",
-            "cursor_activity_export.json",
-            "development_timeline.json"
-        ]
-        
-        return any(pattern in str(file_path) for pattern in monitored_patterns)
+        key = event.src_path
+        last = self.last_modified.get(key)
+        if last is not None and current_time - last < self.debounce_time:
+            return
+
+        self.last_modified[key] = current_time
+        self.last_modified.move_to_end(key)
+
+        # Expire entries old enough to be irrelevant, and cap the dict
+        # so a long-running observer can't grow it without bound
+        horizon = current_time - 10 * self.debounce_time
+        while self.last_modified and (
+                next(iter(self.last_modified.values())) < horizon
+                or len(self.last_modified) > self._DEBOUNCE_MAX_ENTRIES):
+            self.last_modified.popitem(last=False)
+
+        # Lazy %s formatting: the string is only built if a handler
+        # actually emits the record
+        logger.info("File changed: %s", key)
+        self.sync_callback(key)
 
 class WebhookSync:
     def __init__(self, 
@@ -77,8 +174,26 @@ class WebhookSync:
         self.hf_repo = hf_repo
         self.webhook_port = webhook_port
         self.observer = None
-        self.sync_queue = []
+        # Queue.get parks the worker on a kernel primitive until work
+        # arrives; the companion set keeps the O(1) dedup check
+        self.sync_queue = queue.Queue()
+        self._queued = set()
         self.sync_lock = threading.Lock()
+        # How long to keep draining the queue after the first item, so a
+        # burst of watchdog events becomes one commit and one push
+        self.drain_window = 2.0  # seconds
+
+        # Content hash of the last synced version of each file, so
+        # mtime churn with identical bytes skips the git pipeline
+        self._last_hash: Dict[str, str] = {}
+
+        # In-process git repo handle (None -> subprocess git)
+        self._repo = None
+        if pygit2 is not None:
+            try:
+                self._repo = pygit2.Repository('.')
+            except pygit2.GitError:
+                pass
         
         # Start background sync thread
         self.sync_thread = threading.Thread(target=self._sync_worker, daemon=True)
@@ -87,72 +202,98 @@ class WebhookSync:
     def _sync_worker(self):
         """Background worker for processing sync queue"""
         while True:
+            # Block for the first item, then drain the burst that
+            # usually follows it so the whole batch shares one commit
+            batch = [self.sync_queue.get()]
+            while True:
+                try:
+                    batch.append(self.sync_queue.get(timeout=self.drain_window))
+                except queue.Empty:
+                    break
+
+            with self.sync_lock:
+                for file_path in batch:
+                    self._queued.discard(file_path)
             try:
-                if self.sync_queue:
-                    with self.sync_lock:
-                        file_path = self.sync_queue.pop(0)
-                    
-                    self.sync_file(file_path)
-                else:
-                    time.sleep(1)
+                self.sync_files(batch)
             except Exception as e:
                 logger.error(f"Sync worker error: {e}")
-                time.sleep(5)
+            finally:
+                for _ in batch:
+                    self.sync_queue.task_done()
     
     def queue_sync(self, file_path: str):
         """Queue file for syncing"""
         with self.sync_lock:
-            if file_path not in self.sync_queue:
-                self.sync_queue.append(file_path)
-                logger.info(f"Queued for sync: {file_path}")
+            if file_path in self._queued:
+                return
+            self._queued.add(file_path)
+        self.sync_queue.put(file_path)
+        logger.info(f"Queued for sync: {file_path}")
     
-    def sync_file(self, file_path: str):
-        """Sync individual file to Hugging Face"""
+    def sync_files(self, file_paths: List[str]):
+        """Sync a batch of files to Hugging Face as one commit and push"""
+        # Copy files to current directory
+        dest_names = []
+        for file_path in file_paths:
+            src = Path(file_path)
+            if not src.exists():
+                logger.warning(f"File not found: {src}")
+                continue
+            try:
+                content_hash = _content_hash(src)
+                if self._last_hash.get(src.name) == content_hash:
+                    logger.info(f"Content unchanged, skipping: {src.name}")
+                    continue
+                _fast_copy(src, src.name)
+                dest_names.append(src.name)
+                self._last_hash[src.name] = content_hash
+            except OSError as e:
+                logger.error(f"Failed to copy {src}: {e}")
+
+        if not dest_names:
+            return
+
         try:
-            file_path = Path(file_path)
-            
-            # Copy file to current directory
-            dest_name = file_path.name
-            if file_path.exists():
-                import shutil
-                shutil.copy2(file_path, dest_name)
-                
-                # Add to git
-                import subprocess
-                subprocess.run(["git", "add", dest_name], check=True)
-                
-                # Commit and push
-                commit_message = f"Auto-sync: {dest_name} - {datetime.now().isoformat()}"
+            # One add, one commit, one push for the whole batch instead
+            # of three forks plus a network round trip per file
+            commit_message = f"Auto-sync: {', '.join(dest_names)} - {datetime.now().isoformat()}"
+            if not self._commit_in_process(dest_names, commit_message):
+                subprocess.run(["git", "add", "--"] + dest_names, check=True)
                 subprocess.run(["git", "commit", "-m", commit_message], check=True)
-                subprocess.run(["git", "push", "origin", "master"], check=True)
-                
-                logger.info(f"Successfully synced: {dest_name}")
-            else:
-                logger.warning(f"File not found: {file_path}")
-                
+            subprocess.run(["git", "push", "origin", "master"], check=True)
+
+            logger.info(f"Successfully synced: {', '.join(dest_names)}")
         except Exception as e:
-            logger.error(f"Failed to sync {file_path}: {e}")
+            logger.error(f"Failed to sync {dest_names}: {e}")
+
+    def _commit_in_process(self, dest_names: List[str], message: str) -> bool:
+        """Stage and commit via pygit2, returning False to use git CLI"""
+        if self._repo is None:
+            return False
+        try:
+            index = self._repo.index
+            for name in dest_names:
+                index.add(name)
+            index.write()
+            tree = index.write_tree()
+            signature = self._repo.default_signature
+            self._repo.create_commit('HEAD', signature, signature,
+                                     message, tree, [self._repo.head.target])
+            return True
+        except (pygit2.GitError, KeyError) as e:
+            logger.warning(f"pygit2 commit failed, falling back to git CLI: {e}")
+            return False
     
     def start_file_monitoring(self):
         """Start file system monitoring"""
         event_handler = CursorFileHandler(self.queue_sync)
         self.observer = Observer()
         
-        # Monitor source directory
+        # One recursive watch covers the whole tree; scheduling the
+        # subdirectories again would just fire the handler twice per event
         self.observer.schedule(event_handler, str(self.source_dir), recursive=True)
-        
-        # Monitor specific subdirectories
-        subdirs = [
-            "cursor_api_analysis",
-            "prompt_versions", 
-            "enhanced_cursor_export"
-        ]
-        
-        for subdir in subdirs:
-            subdir_path = self.source_dir / subdir
-            if subdir_path.exists():
-                self.observer.schedule(event_handler, str(subdir_path), recursive=True)
-        
+
         self.observer.start()
         logger.info(f"Started file monitoring on {self.source_dir}")
     
@@ -187,7 +328,7 @@ class WebhookSync:
         def webhook_status():
             return jsonify({
                 "status": "running",
-                "queue_size": len(self.sync_queue),
+                "queue_size": self.sync_queue.qsize(),
                 "monitoring": self.observer.is_alive() if self.observer else False
             })
         
@@ -219,7 +360,10 @@ class WebhookSync:
         """Run webhook server"""
         app = self.create_webhook_app()
         logger.info(f"Starting webhook server on port {self.webhook_port}")
-        app.run(host='0.0.0.0', port=self.webhook_port, debug=False)
+        if waitress_serve is not None:
+            waitress_serve(app, host='0.0.0.0', port=self.webhook_port, threads=8)
+        else:
+            app.run(host='0.0.0.0', port=self.webhook_port, debug=False)
 
 def main():
     parser = argparse.ArgumentParser(description="Webhook-based Cursor dataset sync")